@@ -4,9 +4,20 @@ from dataclasses import dataclass
 
 import ee
 
+from .client import get_client
 from .features import Features
+from .geometry import PreparedGeometry, prepare_geometry
 from .helpers import image_processing, monitor_task
-from .modeling import SmileRandomForest
+from .incremental import (
+    Manifest,
+    classify_tiles,
+    input_images,
+    run_stamp,
+    tile_grid,
+    tile_prefix,
+    tile_versions,
+)
+from .modeling import ShardedSmileRandomForest, SmileRandomForest
 
 
 @dataclass
@@ -15,6 +26,9 @@ class Datasets:
     dc: str | None
     ft: str | None
     ta: str | None
+    s1_windows: list[tuple[str, str]] | None = None
+    rf_shards: int | None = None
+    aoi_max_error: float | None = None
 
 
 def split_id(id: str) -> tuple[str, str]:
@@ -28,12 +42,113 @@ def load_payload(filename: str) -> Datasets | int:
     with open(filename, "r") as d:
         data = json.load(d)
 
-    return Datasets(data.get("s1"), data.get("dc"), data.get("ft"), data.get("ta"))
+    return Datasets(
+        data.get("s1"),
+        data.get("dc"),
+        data.get("ft"),
+        data.get("ta"),
+        data.get("s1_windows"),
+        data.get("rf_shards"),
+        data.get("aoi_max_error"),
+    )
+
+
+def prepare_region(region_id: str, dataset: Datasets) -> PreparedGeometry:
+    aoi = prepare_geometry(ee.FeatureCollection(region_id), dataset.aoi_max_error)
+    vertices = aoi.vertex_counts()
+    print(
+        f"AOI vertices: {vertices['exact']} exact, {vertices['simplified']} "
+        f"simplified, {vertices['bounds']} bounds (max error {aoi.max_error} m)"
+    )
+    return aoi
+
+
+def load_model(
+    asset_name: str, dataset: Datasets, train: ee.FeatureCollection
+) -> SmileRandomForest:
+    """Load the saved model, the sub-forests of a sharded model are combined over
+    the class values of the training split"""
+    if dataset.rf_shards:
+        return ShardedSmileRandomForest.load_model(
+            asset_name,
+            shards=dataset.rf_shards,
+            classes=train.aggregate_array("class_name").distinct().sort(),
+        )
+    return SmileRandomForest.load_model(asset_name)
+
+
+def classify_region(
+    region_id: str,
+    dataset: Datasets,
+    model: SmileRandomForest,
+    name: str,
+    manifest: Manifest,
+    manifest_file: str,
+) -> int:
+    """Classify the region tile by tile on the shared tile grid, only the tiles
+    whose inputs changed against the manifest are exported"""
+    aoi = prepare_region(region_id, dataset)
+    tiles = tile_grid(aoi.cover(), manifest.tile_scale)
+    current, regions = tile_versions(tiles, input_images(dataset))
+    changed = manifest.changed(current)
+    print(f"Tiles changed: {len(changed)} of {len(current)}")
+    if not changed:
+        return 0
+
+    run = run_stamp()
+    tasks = classify_tiles(regions, changed, dataset, model, name, run, mask=aoi)
+    print(
+        "To Monitor Classification tasks go to: https://code.earthengine.google.com/tasks"
+    )
+
+    exit_code = 0
+    for tile_id, task in tasks.items():
+        print(f"Exporting Classification Tile {tile_id}: {task.id}")
+        status = monitor_task(task)
+        if status > 0:
+            print(f"Error: Tile {tile_id} Task Non Zero status")
+            exit_code = status
+            continue
+        # only record tiles that finished so failures are retried next run
+        manifest.update(
+            {tile_id: current[tile_id]}, {tile_id: tile_prefix(name, tile_id, run)}
+        ).save(manifest_file)
+
+    return exit_code
+
+
+def update(args: list[str]) -> int:
+    """Reclassify only the tiles whose inputs changed since the last run"""
+    if len(args) != 4:
+        print(
+            "<Usage>: main.py update <features_id> <regions_id> <payload.json> <manifest.json>"
+        )
+        return 1
+
+    feature_id, region_id, payload, manifest_file = args
+    dataset = load_payload(payload)
+    project_root, name = split_id(feature_id)
+
+    train = Features(f"{project_root}/{name}_samples").get_training("type", 1).dataset
+    model = load_model(f"{project_root}/{name}_rf_model", dataset, train)
+    return classify_region(
+        region_id, dataset, model, name, Manifest.load(manifest_file), manifest_file
+    )
 
 
 def main() -> int:
     args = sys.argv[1:]
 
+    if args and args[0] == "update":
+        exit_code = update(args[1:])
+    else:
+        exit_code = classify(args)
+
+    print(get_client().metrics.summary())
+    return exit_code
+
+
+def classify(args: list[str]) -> int:
     # needs to args a 2 asset ids, one that represents features and one the aoi
     if len(args) != 3:
         print("<Usage>: main.py <features_id> <regions_id> <payload.json>")
@@ -51,7 +166,7 @@ def main() -> int:
     features = Features(feature_id)
     stack = image_processing(
         datasets=dataset,
-        aoi=features.dataset,
+        aoi=prepare_geometry(features.dataset, dataset.aoi_max_error).bounds,
     )  # the object we want to extract features from
     samples = features.extract(stack)
     # save the extracted features to asset store
@@ -71,14 +186,28 @@ def main() -> int:
     test = buldt_features.get_testing("type", 2).dataset
 
     # need to create our model, and fit
-    rf = SmileRandomForest()
+    if dataset.rf_shards:
+        rf = ShardedSmileRandomForest(shards=dataset.rf_shards)
+    else:
+        rf = SmileRandomForest()
     rf.fit(features=train, label_col="class_name", predictors=stack.bandNames())
     rf_model_id = f"{project_root}/{name}_rf_model"
-    rf_model_task = rf.save_model(rf_model_id)
-    print(f"Exporting Model: {rf_model_task.id}")
-
-    # do assessment
-    confusion_matrix = rf.assess(test)
+    rf_model_tasks = rf.save_model(rf_model_id)
+    if not isinstance(rf_model_tasks, list):
+        rf_model_tasks = [rf_model_tasks]
+    for rf_model_task in rf_model_tasks:
+        print(f"Exporting Model: {rf_model_task.id}")
+
+    # wait for the model (every sub-forest when sharded) to land in the asset store
+    for rf_model_task in rf_model_tasks:
+        rf_task = monitor_task(rf_model_task)
+        if rf_task > 1:
+            print("Error: Random Forest Task Non Zero status")
+            return rf_task
+
+    # do assessment with the saved model so the trees are not retrained in one task
+    model = load_model(rf_model_id, dataset, train)
+    confusion_matrix = model.assess(test)
 
     (
         confusion_matrix.add_accuracy()
@@ -89,41 +218,11 @@ def main() -> int:
         .save_table_to_drive(name=f"{name}_confusion_matrix", folder_name=f"{name}")
     )
 
-    # save model to asset store
-    # save assessment table to
-    rf_task = monitor_task(rf_model_task)
-    if rf_task > 1:
-        print("Error: Random Forest Task Non Zero status")
-        return rf_task
-
-    # Step 3: Classify the stack
-    aoi = ee.FeatureCollection(region_id).geometry()
-    stack = image_processing(aoi, dataset)
-
-    model = SmileRandomForest.load_model(rf_model_id)
-
-    predict = model.predict(stack)
-
-    classified_image_task = ee.batch.Export.image.toDrive(
-        image=predict,
-        description="",
-        folder=f"{name}_classification",
-        fileNamePrefix=f"{name}-",
-        region=aoi,
-        scale=10,
-        crs="EPSG:4326",
-        maxPixels=1e13,
-        fileDimensions=[2048, 2048],
-        skipEmptyTiles=True,
-        formatOptions={"cloudOptimized": True},
-    )
-    print(f"Exporting Classification: {classified_image_task.id}")
-    classified_image_task.start()
-    print(
-        "To Monitor Classification task go to: https://code.earthengine.google.com/tasks"
-    )
-
-    return 0
+    # Step 3: Classify the region on the tile grid and write the tile manifest
+    # that later `cnwi update` runs compare against
+    manifest_file = f"{name}_manifest.json"
+    print(f"Writing Tile Manifest: {manifest_file}")
+    return classify_region(region_id, dataset, model, name, Manifest(), manifest_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Hashable
+
+import ee
+
+
+# status codes only count when reported as one i.e. "HTTP Error 503", counts such
+# as "Found 500 pixels" in permanent errors must not be retried
+RETRY_STATUS = re.compile(r"\b(?:http|error|status|code)\W*(429|50[0-4])\b")
+# transient conditions only, permanent errors such as asset storage quota
+# must not be retried
+RETRY_MESSAGES = (
+    "too many requests",
+    "too many concurrent",
+    "rate limit",
+    "rate exceeded",
+    "internal error",
+    "service unavailable",
+    "deadline exceeded",
+)
+
+
+def status_code(exc: BaseException) -> int | None:
+    """HTTP status from the common error types (urllib, requests, googleapiclient)"""
+    for attr in ("code", "status_code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    resp = getattr(exc, "resp", None) or getattr(exc, "response", None)
+    value = getattr(resp, "status", None) or getattr(resp, "status_code", None)
+    return int(value) if value is not None else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429 and 5xx responses, and EE errors reporting them in the message"""
+    code = status_code(exc)
+    if code is not None:
+        return code == 429 or 500 <= code < 600
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    message = str(exc).lower()
+    return bool(RETRY_STATUS.search(message)) or any(
+        text in message for text in RETRY_MESSAGES
+    )
+
+
+@dataclass
+class ClientMetrics:
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    throttled: int = 0
+    throttle_wait: float = 0.0
+    coalesced: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> str:
+        return (
+            f"EE calls: {self.calls}, retries: {self.retries}, "
+            f"failures: {self.failures}, timeouts: {self.timeouts}, "
+            f"throttled: {self.throttled} ({self.throttle_wait:.1f} s), "
+            f"coalesced: {self.coalesced}"
+        )
+
+
+class TokenBucket:
+    """Allow rate requests per second with bursts of up to capacity"""
+
+    def __init__(self, rate: float, capacity: int = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, blocking until one is available. Returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class Client:
+    """Rate limited, retrying gateway for Earth Engine API calls.
+
+    Args:
+        rate (float): requests per second across all threads
+        burst (int): token bucket capacity
+        max_workers (int): concurrent requests in flight
+        max_retries (int): retries for 429 / 5xx errors before giving up
+        backoff (float): base seconds for exponential backoff, full jitter is applied
+        max_backoff (float): upper bound on a single backoff sleep
+        timeout (float): seconds to wait on a call before raising TimeoutError
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: int = None,
+        max_workers: int = 8,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        timeout: float = None,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.metrics = ClientMetrics()
+        self._lock = threading.Lock()
+        self._inflight: dict[Hashable, Future] = {}
+
+    def _record(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self.metrics, name, getattr(self.metrics, name) + value)
+
+    def _sleep_for(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def _run(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self._record(calls=1, throttled=int(waited > 0), throttle_wait=waited)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as exc:
+                if attempt >= self.max_retries or not is_retryable(exc):
+                    self._record(failures=1)
+                    raise
+                self._record(retries=1)
+                time.sleep(self._sleep_for(attempt))
+                attempt += 1
+
+    def submit(self, fn: Callable, *args, key: Hashable = None, **kwargs) -> Future:
+        """Schedule fn on the worker pool. Calls sharing a key while one is still
+        in flight are coalesced onto the same future"""
+        if key is None:
+            return self.pool.submit(self._run, fn, args, kwargs)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.metrics.coalesced += 1
+                return future
+            future = self.pool.submit(self._run, fn, args, kwargs)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._release(key, future))
+        return future
+
+    def _release(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def call(self, fn: Callable, *args, key: Hashable = None, **kwargs) -> Any:
+        future = self.submit(fn, *args, key=key, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._record(timeouts=1)
+            # don't let later calls with the same key wait on the hung request
+            future.cancel()
+            if key is not None:
+                self._release(key, future)
+            raise
+
+    # -- Earth Engine calls
+    def get_info(self, obj: ee.ComputedObject) -> Any:
+        return self.call(obj.getInfo, key=("getInfo", obj.serialize()))
+
+    def task_status(self, task: ee.batch.Task) -> dict:
+        return self.call(task.status, key=("status", task.id))
+
+    def start_task(self, task: ee.batch.Task) -> ee.batch.Task:
+        self.call(task.start)
+        return task
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True)
+
+
+_client: Client | None = None
+
+
+def get_client() -> Client:
+    """Shared client used by the rest of cnwi"""
+    global _client
+    if _client is None:
+        _client = Client()
+    return _client
+
+
+def set_client(client: Client) -> Client:
+    global _client
+    _client = client
+    return client
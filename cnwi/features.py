@@ -1,5 +1,7 @@
 import ee
 
+from .client import get_client
+
 
 class Features:
     def __init__(self, asset_id, label_col: str = None) -> None:
@@ -38,6 +40,6 @@ class Features:
         )
 
         if start_task:
-            task.start()
+            get_client().start_task(task)
 
         return task
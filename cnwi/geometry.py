@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import ee
+
+from .client import get_client
+
+
+# max error in meters for the simplified / bounding geometries
+MAX_ERROR = 100.0
+
+
+@dataclass
+class PreparedGeometry:
+    """An aoi with cheap stand-ins for the expensive full resolution geometry.
+
+    bounds: bounding box, used as the sampling aoi
+    simplified: geometry simplified to max_error, used for tiling
+    exact: the original geometry, only used for the vertex counts
+    features: the aoi features, used for the final mask
+
+    bounds and simplified are literal geometries fetched once, so tasks using
+    them never recompute them from the full resolution polygons.
+    """
+
+    exact: ee.Geometry
+    simplified: ee.Geometry
+    bounds: ee.Geometry
+    features: ee.FeatureCollection
+    max_error: float = MAX_ERROR
+    vertices: dict[str, int] = field(default_factory=dict)
+
+    def vertex_counts(self) -> dict[str, int]:
+        return self.vertices
+
+    def cover(self) -> ee.Geometry:
+        """Simplified geometry grown by max_error, simplifying can move the
+        boundary inward by up to max_error so this still covers the exact aoi"""
+        return self.simplified.buffer(self.max_error)
+
+    def mask(self, image: ee.Image, region: ee.Geometry = None) -> ee.Image:
+        """Clip to the aoi features, only the features touching region are used
+        when given so the full resolution union is never built"""
+        features = self.features
+        if region is not None:
+            features = features.filterBounds(region)
+        return image.clipToCollection(features)
+
+
+_cache: dict[tuple[str, float], PreparedGeometry] = {}
+
+
+def count_vertices(geometry: ee.Geometry) -> ee.Number:
+    return geometry.coordinates().flatten().length().divide(2)
+
+
+def prepare_geometry(
+    geometry: ee.Geometry | ee.FeatureCollection, max_error: float = None
+) -> PreparedGeometry:
+    """Build (or reuse) the prepared geometries for an aoi. The simplified and
+    bounding geometries and the vertex counts are computed in a single request"""
+    if max_error is None:
+        max_error = MAX_ERROR
+    if isinstance(geometry, ee.FeatureCollection):
+        features = geometry
+        geometry = geometry.geometry()
+    else:
+        features = ee.FeatureCollection([ee.Feature(geometry)])
+
+    key = (geometry.serialize(), max_error)
+    if key not in _cache:
+        simplified = geometry.simplify(max_error)
+        bounds = geometry.bounds(max_error)
+        info = get_client().get_info(
+            ee.Dictionary(
+                {
+                    "simplified": simplified,
+                    "bounds": bounds,
+                    "vertices": {
+                        "exact": count_vertices(geometry),
+                        "simplified": count_vertices(simplified),
+                        "bounds": count_vertices(bounds),
+                    },
+                }
+            )
+        )
+        _cache[key] = PreparedGeometry(
+            exact=geometry,
+            simplified=ee.Geometry(info["simplified"]),
+            bounds=ee.Geometry(info["bounds"]),
+            features=features,
+            max_error=max_error,
+            vertices={k: int(v) for k, v in info["vertices"].items()},
+        )
+    return _cache[key]
+
+
+def clear_cache() -> None:
+    _cache.clear()
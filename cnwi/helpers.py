@@ -2,6 +2,7 @@ import ee
 
 
 from . import rsd
+from .client import get_client
 
 
 def image_processing(aoi, datasets) -> ee.Image:
@@ -21,15 +22,17 @@ def image_processing(aoi, datasets) -> ee.Image:
     # set up the datasets
     if datasets.s1 is not None:
         s1_rsd = rsd.RemoteSensingDataset(dataset_id=datasets.s1, aoi=aoi)
-        s1_es, s1_ls = rsd.RemoteSensingDatasetProcessing().s1_processing(s1_rsd)
-        stack.extend([s1_es.mosaic(), s1_ls.mosaic()])
+        s1 = rsd.RemoteSensingDatasetProcessing().s1_processing(
+            s1_rsd, windows=datasets.s1_windows
+        )
+        stack.append(s1)
 
     if datasets.dc is not None:
         dc_rsd = rsd.RemoteSensingDataset(dataset_id=datasets.dc, aoi=aoi)
         data_cube = rsd.RemoteSensingDatasetProcessing().data_cube_processing(dc_rsd)
         stack.append(data_cube.mosaic())
 
-    al_rsd = rsd.RemoteSensingDataset(dataset_id="JAXA/ALOS/PALSAR/YEARLY/SAR", aoi=aoi)
+    al_rsd = rsd.RemoteSensingDataset(dataset_id=rsd.ALOS_ID, aoi=aoi)
     alos = rsd.RemoteSensingDatasetProcessing().alos_processing(al_rsd)
     stack.append(alos.median())
 
@@ -47,16 +50,40 @@ def image_processing(aoi, datasets) -> ee.Image:
     return ee.Image.cat(*stack)
 
 
+def export_classification(
+    image: ee.Image, region: ee.Geometry, folder: str, prefix: str
+) -> ee.batch.Task:
+    """Export a classified image to drive as 2048 x 2048 cloud optimized tiles"""
+    task = ee.batch.Export.image.toDrive(
+        image=image,
+        description="",
+        folder=folder,
+        fileNamePrefix=prefix,
+        region=region,
+        scale=10,
+        crs="EPSG:4326",
+        maxPixels=1e13,
+        fileDimensions=[2048, 2048],
+        skipEmptyTiles=True,
+        formatOptions={"cloudOptimized": True},
+    )
+    get_client().start_task(task)
+    return task
+
+
 def monitor_task(task: ee.batch.Task) -> int:
     import time
 
-    while task.status()["state"] in ["READY", "RUNNING"]:
+    client = get_client()
+    status = client.task_status(task)
+    while status["state"] in ["READY", "RUNNING"]:
         time.sleep(5)
+        status = client.task_status(task)
 
     status_code = {"COMPLETED": 0, "FAILED": 1, "CANCELLED": 2}
-    exit_code = status_code[task.status()["state"]]
+    exit_code = status_code[status["state"]]
 
     if exit_code == 1:
-        print(task.status()["error_message"])
+        print(status["error_message"])
 
     return exit_code
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+import ee
+
+from . import rsd
+from .client import get_client
+from .geometry import PreparedGeometry
+from .helpers import export_classification, image_processing
+
+
+# 2048 px tiles at 10 m, matches the classification export fileDimensions
+TILE_SCALE = 20480
+
+
+@dataclass
+class Manifest:
+    """Tile index shared by full and incremental runs.
+
+    tiles: tile id -> sorted input image versions ("<image id>@<system:version>")
+        used for the last successful classification of that tile
+    prefixes: tile id -> file name prefix of that classification, older exports of
+        the same tile in the drive folder are superseded
+    """
+
+    tiles: dict[str, list[str]] = field(default_factory=dict)
+    prefixes: dict[str, str] = field(default_factory=dict)
+    tile_scale: float = TILE_SCALE
+
+    @classmethod
+    def load(cls, filename: str) -> Manifest:
+        if not os.path.exists(filename):
+            return cls()
+        with open(filename, "r") as f:
+            return cls(**json.load(f))
+
+    def save(self, filename: str) -> None:
+        with open(filename, "w") as f:
+            json.dump(asdict(self), f, indent=2, sort_keys=True)
+
+    def changed(self, current: dict[str, list[str]]) -> list[str]:
+        """Tiles whose inputs were added, updated or removed since the last run"""
+        return sorted(
+            tile for tile, inputs in current.items() if self.tiles.get(tile) != inputs
+        )
+
+    def update(
+        self, tiles: dict[str, list[str]], prefixes: dict[str, str] = None
+    ) -> Manifest:
+        self.tiles.update(tiles)
+        self.prefixes.update(prefixes or {})
+        return self
+
+    def current_files(self, paths: list[str]) -> list[str]:
+        """Downloaded tile files that belong to the latest export of each tile,
+        superseded exports are left out so they are not counted twice"""
+        prefixes = tuple(self.prefixes.values())
+        return [path for path in paths if os.path.basename(path).startswith(prefixes)]
+
+
+def tile_key(tile_id: str) -> str:
+    """File name safe tile id i.e. '-12,34' -> 'm12_34'"""
+    return re.sub(r"[^0-9A-Za-z]+", "_", tile_id.replace("-", "m"))
+
+
+def tile_prefix(name: str, tile_id: str, run: str) -> str:
+    """Export file prefix, the run stamp keeps each export of a tile distinct"""
+    return f"{name}-{tile_key(tile_id)}-{run}-"
+
+
+def run_stamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+
+
+def tile_grid(aoi: ee.Geometry, scale: float = TILE_SCALE) -> ee.FeatureCollection:
+    """Fixed grid of tiles covering the aoi, ids are stable between runs"""
+    return aoi.coveringGrid(ee.Projection("EPSG:4326").atScale(scale))
+
+
+def _versioned(collection: ee.ImageCollection) -> ee.ImageCollection:
+    return collection.map(
+        lambda x: x.set(
+            "cnwi:input",
+            ee.String(x.get("system:id"))
+            .cat("@")
+            .cat(ee.Number(x.get("system:version")).format("%d")),
+        )
+    )
+
+
+def input_images(datasets) -> ee.ImageCollection:
+    """All images feeding image_processing, tagged with their id and version.
+    Sentinel 1 scenes outside the compositing windows are left out as they never
+    reach the classification"""
+    inputs = [
+        ee.ImageCollection(rsd.ALOS_ID).filterDate(*rsd.ALOS_DATES),
+    ]
+    if datasets.s1 is not None:
+        windows = datasets.s1_windows or rsd.S1_WINDOWS
+        in_windows = ee.Filter.Or(
+            *[ee.Filter.date(start, end) for start, end in windows]
+        )
+        inputs.append(ee.ImageCollection(datasets.s1).filter(in_windows))
+    for dataset_id in (datasets.dc, datasets.ta, datasets.ft):
+        if dataset_id is not None:
+            inputs.append(ee.ImageCollection(dataset_id))
+
+    merged = _versioned(inputs[0])
+    for collection in inputs[1:]:
+        merged = merged.merge(_versioned(collection))
+    return merged
+
+
+def tile_versions(
+    tiles: ee.FeatureCollection, inputs: ee.ImageCollection
+) -> tuple[dict[str, list[str]], dict[str, ee.Geometry]]:
+    """Input versions intersecting each tile's footprint and the tile footprints,
+    fetched in one request. The footprints come back as literal geometries so
+    tile tasks don't carry the grid computation"""
+    tiles = tiles.map(
+        lambda x: x.set(
+            {
+                "inputs": inputs.filterBounds(x.geometry())
+                .aggregate_array("cnwi:input")
+                .sort(),
+                "region": x.geometry(),
+            }
+        )
+    )
+    ids = tiles.aggregate_array("system:index")
+    info = get_client().get_info(
+        ee.Dictionary(
+            {
+                "inputs": ee.Dictionary.fromLists(ids, tiles.aggregate_array("inputs")),
+                "regions": ee.Dictionary.fromLists(
+                    ids, tiles.aggregate_array("region")
+                ),
+            }
+        )
+    )
+    regions = {
+        tile_id: ee.Geometry(region) for tile_id, region in info["regions"].items()
+    }
+    return info["inputs"], regions
+
+
+def classify_tiles(
+    regions: dict[str, ee.Geometry],
+    tile_ids: list[str],
+    datasets,
+    model,
+    name: str,
+    run: str,
+    mask: PreparedGeometry = None,
+) -> dict[str, ee.batch.Task]:
+    """Start a classification export for each tile, named with tile_prefix. The
+    tile is clipped to the aoi features touching it when a mask is given"""
+    tasks = {}
+    for tile_id in tile_ids:
+        region = regions[tile_id]
+        predict = model.predict(image_processing(region, datasets))
+        if mask is not None:
+            predict = mask.mask(predict, region)
+        tasks[tile_id] = export_classification(
+            predict,
+            region,
+            folder=f"{name}_classification",
+            prefix=tile_prefix(name, tile_id, run),
+        )
+    return tasks
@@ -1,8 +1,10 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 import ee
 
+from .client import get_client
+
 
 class ConfusionMatrix:
     def __init__(self, data):
@@ -48,7 +50,7 @@ class ConfusionMatrix:
         )
 
         if start_task:
-            task.start()
+            get_client().start_task(task)
         return task
 
 
@@ -85,16 +87,22 @@ class SmileRandomForest:
         predictors: list[str] | ee.List[str],
     ) -> SmileRandomForest:
 
-        self.model = ee.Classifier.smileRandomForest(
-            numberOfTrees=self.hyper.numberOfTrees,
-            variablesPerSplit=self.hyper.variablesPerSplit,
-            minLeafPopulation=self.hyper.minLeafPopulation,
-            bagFraction=self.hyper.bagFraction,
-            maxNodes=self.hyper.maxNodes,
-            seed=self.hyper.seed,
-        ).train(features, label_col, predictors)
+        self.model = self._classifier(self.hyper).train(
+            features, label_col, predictors
+        )
         return self
 
+    @staticmethod
+    def _classifier(hyper: HyperParameters) -> ee.Classifier:
+        return ee.Classifier.smileRandomForest(
+            numberOfTrees=hyper.numberOfTrees,
+            variablesPerSplit=hyper.variablesPerSplit,
+            minLeafPopulation=hyper.minLeafPopulation,
+            bagFraction=hyper.bagFraction,
+            maxNodes=hyper.maxNodes,
+            seed=hyper.seed,
+        )
+
     def predict(
         self, X: ee.Image | ee.FeatureCollection
     ) -> ee.Image | ee.FeatureCollection:
@@ -115,6 +123,175 @@ class SmileRandomForest:
             classifier=self.model, assetId=asset_name, description=""
         )
 
-        task.start()
+        get_client().start_task(task)
 
         return task
+
+
+def shard_trees(number_of_trees: int, shards: int) -> list[int]:
+    """Split the trees as evenly as possible, the shard sizes sum to number_of_trees"""
+    if shards < 1 or shards > number_of_trees:
+        raise ValueError("shards must be between 1 and numberOfTrees")
+    base, extra = divmod(number_of_trees, shards)
+    return [base + (idx < extra) for idx in range(shards)]
+
+
+class ShardedSmileRandomForest(SmileRandomForest):
+    """numberOfTrees split over K sub-forests with their own seeds.
+
+    Each sub-forest is trained and exported as its own task so they run
+    concurrently and stay under the per-task memory / time limits.
+
+    Args:
+        shards (int): number of sub-forests
+        combine (str): "vote" sums the per class tree votes over the sub-forests
+            (each sub-forest vote fraction times its tree count), so the label
+            matches a single forest voting with all its trees. "probability"
+            averages the sub-forest class probabilities weighted by tree count.
+            Ties go to the lowest class value
+        classes (list[int]): sorted class values, used to map the argmax back to
+            a label. Set by fit, must be given to load_model as it is not stored
+            with the classifier assets
+    """
+
+    COMBINE = ("vote", "probability")
+
+    def __init__(
+        self,
+        hyperparams: HyperParameters = HyperParameters(),
+        shards: int = 4,
+        combine: str = "vote",
+        classes: list[int] | ee.List = None,
+    ) -> None:
+        super().__init__(hyperparams)
+        if combine not in self.COMBINE:
+            raise ValueError(f"combine must be one of {self.COMBINE}")
+        self.trees = shard_trees(self.hyper.numberOfTrees, shards)
+        self.combine = combine
+        self.classes = classes
+        self.models: list[ee.Classifier] = []
+
+    @property
+    def shards(self) -> int:
+        return len(self.trees)
+
+    @staticmethod
+    def shard_id(asset_name: str, idx: int) -> str:
+        return f"{asset_name}_{idx}"
+
+    @classmethod
+    def load_model(
+        cls,
+        asset_name: str,
+        hyperparams: HyperParameters = HyperParameters(),
+        shards: int = 4,
+        combine: str = "vote",
+        classes: list[int] | ee.List = None,
+    ) -> ShardedSmileRandomForest:
+        if classes is None:
+            raise ValueError("classes are required to load a sharded ensemble")
+        instance = cls(hyperparams, shards, combine, classes)
+        instance.models = [
+            ee.Classifier.load(cls.shard_id(asset_name, idx))
+            for idx in range(instance.shards)
+        ]
+        return instance
+
+    def fit(
+        self,
+        features: ee.FeatureCollection,
+        label_col: str,
+        predictors: list[str] | ee.List[str],
+    ) -> ShardedSmileRandomForest:
+        self.models = [
+            self._classifier(
+                replace(self.hyper, numberOfTrees=trees, seed=self.hyper.seed + idx)
+            ).train(features, label_col, predictors)
+            for idx, trees in enumerate(self.trees)
+        ]
+        self.classes = features.aggregate_array(label_col).distinct().sort()
+        return self
+
+    def _weights(self) -> list[float]:
+        """Per sub-forest factor on its class probabilities, tree counts turn the
+        "vote" fractions back into tree votes"""
+        if self.combine == "vote":
+            return [float(trees) for trees in self.trees]
+        total = sum(self.trees)
+        return [trees / total for trees in self.trees]
+
+    def predict(
+        self, X: ee.Image | ee.FeatureCollection
+    ) -> ee.Image | ee.FeatureCollection:
+        if self.classes is None:
+            raise ValueError("classes are required to combine the sub-forests")
+
+        names = [f"classification_{idx}" for idx in range(self.shards)]
+        models = [model.setOutputMode("MULTIPROBABILITY") for model in self.models]
+
+        if isinstance(X, ee.Image):
+            # Image.classify only returns the output band, every sub-forest has to
+            # classify the original predictors
+            outputs = ee.Image.cat(
+                [X.classify(model, name) for model, name in zip(models, names)]
+            )
+            return self._combine_image(outputs, names)
+
+        # FeatureCollection.classify keeps the properties so the outputs can chain
+        for model, name in zip(models, names):
+            X = X.classify(model, name)
+        return X.map(lambda x: self._combine_feature(x, names))
+
+    def _combine_image(self, outputs: ee.Image, names: list[str]) -> ee.Image:
+        weights = self._weights()
+        scores = outputs.select(names[0]).multiply(weights[0])
+        for name, weight in zip(names[1:], weights[1:]):
+            scores = scores.add(outputs.select(name).multiply(weight))
+        classes = ee.List(self.classes)
+        combined = (
+            scores.arrayArgmax()
+            .arrayGet(0)
+            .remap(ee.List.sequence(0, classes.size().subtract(1)), classes)
+        )
+        return combined.rename("classification")
+
+    def _combine_feature(self, feature: ee.Feature, names: list[str]) -> ee.Feature:
+        feature = ee.Feature(feature)
+        weights = self._weights()
+        scores = ee.Array(feature.get(names[0])).multiply(weights[0])
+        for name, weight in zip(names[1:], weights[1:]):
+            scores = scores.add(ee.Array(feature.get(name)).multiply(weight))
+        index = ee.List(scores.argmax()).getNumber(0)
+        keep = feature.propertyNames().removeAll(names).add("classification")
+        return feature.set("classification", ee.List(self.classes).get(index)).select(
+            keep
+        )
+
+    def save_model(self, asset_name) -> list[ee.batch.Task]:
+        """Export every sub-forest to <asset_name>_<idx>, started concurrently"""
+        client = get_client()
+        tasks = [
+            ee.batch.Export.classifier.toAsset(
+                classifier=model,
+                assetId=self.shard_id(asset_name, idx),
+                description="",
+            )
+            for idx, model in enumerate(self.models)
+        ]
+        for future in [client.submit(task.start) for task in tasks]:
+            future.result()
+        return tasks
+
+    def matches(
+        self,
+        monolithic: SmileRandomForest,
+        test: ee.FeatureCollection,
+        tolerance: float = 0.01,
+    ) -> tuple[bool, float, float]:
+        """Check the ensemble overall accuracy is within tolerance of a monolithic
+        model on the same test set. Returns (ok, ensemble, monolithic) accuracy"""
+        client = get_client()
+        ensemble_acc = client.get_info(self.assess(test).cfm.accuracy())
+        monolithic_acc = client.get_info(monolithic.assess(test).cfm.accuracy())
+        ok = abs(ensemble_acc - monolithic_acc) <= tolerance
+        return ok, ensemble_acc, monolithic_acc
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import glob
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+import numpy as np
+import rasterio
+from rasterio.features import bounds as geometry_bounds
+from rasterio.features import rasterize
+from rasterio.windows import Window
+
+EARTH_RADIUS = 6371008.8
+
+
+@dataclass
+class Tile:
+    """An exported classification tile and its offset in the mosaic pixel grid"""
+
+    path: str
+    row: int
+    col: int
+    height: int
+    width: int
+
+
+def tile_paths(folder: str, pattern: str = "*.tif") -> list[str]:
+    """Exported classification tiles in a folder i.e. <name>-0000000000-0000000000.tif"""
+    return sorted(glob.glob(os.path.join(folder, pattern)))
+
+
+def tile_index(paths: list[str]) -> list[Tile]:
+    """Place each tile in the shared pixel grid of the export, tiles from the same
+    export share resolution and alignment so offsets are whole pixels"""
+    meta = []
+    for path in paths:
+        with rasterio.open(path) as src:
+            meta.append((path, src.transform, src.height, src.width))
+
+    x0 = min(transform.c for _, transform, _, _ in meta)
+    y0 = max(transform.f for _, transform, _, _ in meta)
+    return [
+        Tile(
+            path=path,
+            row=round((transform.f - y0) / transform.e),
+            col=round((transform.c - x0) / transform.a),
+            height=height,
+            width=width,
+        )
+        for path, transform, height, width in meta
+    ]
+
+
+def pixel_areas(src, window: Window) -> np.ndarray:
+    """Area in square meters of each pixel row in the window, geographic grids
+    (the export uses EPSG:4326) change area with latitude"""
+    transform = src.window_transform(window)
+    if src.crs is not None and src.crs.is_geographic:
+        top = transform.f + transform.e * np.arange(window.height)
+        bottom = top + transform.e
+        dlon = np.radians(abs(transform.a))
+        return (
+            EARTH_RADIUS**2
+            * dlon
+            * np.abs(np.sin(np.radians(top)) - np.sin(np.radians(bottom)))
+        )
+    return np.full(window.height, abs(transform.a * transform.e))
+
+
+def _nodata(src, nodata: int | None) -> int:
+    if nodata is not None:
+        return nodata
+    return int(src.nodata) if src.nodata is not None else 0
+
+
+def _add_counts(totals: dict, values: np.ndarray, areas: np.ndarray) -> None:
+    if values.size == 0:
+        return
+    pixels = np.bincount(values)
+    area = np.bincount(values, weights=areas)
+    for value in np.flatnonzero(pixels):
+        totals[int(value)]["pixels"] += int(pixels[value])
+        totals[int(value)]["area"] += float(area[value])
+
+
+def _merge(results: Iterable[dict], nested: bool = False) -> dict:
+    merged = defaultdict(lambda: defaultdict(lambda: {"pixels": 0, "area": 0.0}))
+    for result in results:
+        for key, value in result.items():
+            if not nested:
+                merged[None][key]["pixels"] += value["pixels"]
+                merged[None][key]["area"] += value["area"]
+                continue
+            for cls, stats in value.items():
+                merged[key][cls]["pixels"] += stats["pixels"]
+                merged[key][cls]["area"] += stats["area"]
+    if not nested:
+        return {k: dict(v) for k, v in sorted(merged[None].items())}
+    return {
+        zone: {k: dict(v) for k, v in sorted(classes.items())}
+        for zone, classes in sorted(merged.items())
+    }
+
+
+def _tile_class_areas(path: str, nodata: int | None) -> dict:
+    totals = defaultdict(lambda: {"pixels": 0, "area": 0.0})
+    with rasterio.open(path) as src:
+        nd = _nodata(src, nodata)
+        for _, window in src.block_windows(1):
+            block = src.read(1, window=window)
+            areas = np.broadcast_to(pixel_areas(src, window)[:, None], block.shape)
+            valid = block != nd
+            _add_counts(totals, block[valid].astype(np.int64), areas[valid])
+    return {k: dict(v) for k, v in totals.items()}
+
+
+def class_areas(
+    paths: list[str], workers: int | None = None, nodata: int | None = None
+) -> dict[int, dict[str, float]]:
+    """Pixel count and area (m2) per class over all tiles.
+
+    Each tile is streamed one internal block at a time and tiles are spread over
+    a process pool, memory use depends on the block size and not the mosaic size.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_tile_class_areas, paths, [nodata] * len(paths))
+        return _merge(results)
+
+
+def regions_in_bounds(regions: list, bounds) -> list:
+    """Regions whose bounding box intersects bounds (left, bottom, right, top)"""
+    left, bottom, right, top = bounds
+    selected = []
+    for geometry, zone in regions:
+        g_left, g_bottom, g_right, g_top = geometry_bounds(geometry)
+        if g_left <= right and g_right >= left and g_bottom <= top and g_top >= bottom:
+            selected.append((geometry, zone))
+    return selected
+
+
+def _tile_zonal_stats(path: str, regions: list, nodata: int | None) -> dict:
+    totals = defaultdict(lambda: defaultdict(lambda: {"pixels": 0, "area": 0.0}))
+    with rasterio.open(path) as src:
+        # only rasterize the regions that can touch this tile
+        regions = regions_in_bounds(regions, src.bounds)
+        if not regions:
+            return {}
+        nd = _nodata(src, nodata)
+        for _, window in src.block_windows(1):
+            zones = rasterize(
+                regions,
+                out_shape=(window.height, window.width),
+                transform=src.window_transform(window),
+                fill=0,
+                dtype="int32",
+            )
+            if not zones.any():
+                continue
+            block = src.read(1, window=window)
+            areas = np.broadcast_to(pixel_areas(src, window)[:, None], block.shape)
+            for zone in np.unique(zones[zones != 0]):
+                valid = (zones == zone) & (block != nd)
+                _add_counts(totals[int(zone)], block[valid].astype(np.int64), areas[valid])
+    return {zone: {k: dict(v) for k, v in classes.items()} for zone, classes in totals.items()}
+
+
+def zonal_stats(
+    paths: list[str],
+    regions: list[tuple[Any, int]],
+    workers: int | None = None,
+    nodata: int | None = None,
+) -> dict[int, dict[int, dict[str, float]]]:
+    """Pixel count and area (m2) per class inside each region.
+
+    Args:
+        paths (list[str]): classification tiles
+        regions (list[tuple[Any, int]]): (geometry, region id) pairs, geometries are
+            GeoJSON like or shapely in the tile crs, ids must be positive integers
+            and regions should not overlap
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            _tile_zonal_stats,
+            paths,
+            [regions] * len(paths),
+            [nodata] * len(paths),
+        )
+        return _merge(results, nested=True)
+
+
+class _Mosaic:
+    """Windowed reads over the tile grid, used to pull halos from neighbouring tiles"""
+
+    def __init__(self, tiles: list[Tile], nodata: int, dtype) -> None:
+        self.tiles = tiles
+        self.nodata = nodata
+        self.dtype = dtype
+        self._open = {}
+
+    def read(self, row: int, col: int, height: int, width: int) -> np.ndarray:
+        out = np.full((height, width), self.nodata, dtype=self.dtype)
+        for tile in self.tiles:
+            r0, r1 = max(row, tile.row), min(row + height, tile.row + tile.height)
+            c0, c1 = max(col, tile.col), min(col + width, tile.col + tile.width)
+            if r0 >= r1 or c0 >= c1:
+                continue
+            if tile.path not in self._open:
+                self._open[tile.path] = rasterio.open(tile.path)
+            window = Window(c0 - tile.col, r0 - tile.row, c1 - c0, r1 - r0)
+            out[r0 - row : r1 - row, c0 - col : c1 - col] = self._open[tile.path].read(
+                1, window=window
+            )
+        return out
+
+    def close(self) -> None:
+        for src in self._open.values():
+            src.close()
+        self._open = {}
+
+
+def _window_sum(a: np.ndarray, size: int) -> np.ndarray:
+    c = np.pad(a, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    return c[size:, size:] - c[:-size, size:] - c[size:, :-size] + c[:-size, :-size]
+
+
+def majority(block: np.ndarray, size: int, nodata: int) -> np.ndarray:
+    """Majority of each size x size neighbourhood, block carries a size // 2 halo
+    that is dropped from the output. Ties keep the centre class, nodata does not vote"""
+    r = size // 2
+    center = block[r : block.shape[0] - r, r : block.shape[1] - r]
+    best = center.copy()
+    best_count = np.zeros(center.shape, dtype=np.int32)
+    own_count = np.zeros(center.shape, dtype=np.int32)
+    for value in np.unique(block):
+        if value == nodata:
+            continue
+        counts = _window_sum((block == value).astype(np.int32), size)
+        take = counts > best_count
+        best[take] = value
+        best_count[take] = counts[take]
+        is_own = center == value
+        own_count[is_own] = counts[is_own]
+    best = np.where(own_count >= best_count, center, best)
+    best[center == nodata] = nodata
+    return best
+
+
+def _tile_majority(
+    tile: Tile, tiles: list[Tile], out_dir: str, size: int, nodata: int | None
+) -> str:
+    r = size // 2
+    out_path = os.path.join(out_dir, os.path.basename(tile.path))
+    with rasterio.open(tile.path) as src:
+        nd = _nodata(src, nodata)
+        mosaic = _Mosaic(tiles, nd, src.dtypes[0])
+        profile = src.profile.copy()
+        try:
+            with rasterio.open(out_path, "w", **profile) as dst:
+                for _, window in src.block_windows(1):
+                    block = mosaic.read(
+                        tile.row + window.row_off - r,
+                        tile.col + window.col_off - r,
+                        window.height + 2 * r,
+                        window.width + 2 * r,
+                    )
+                    dst.write(majority(block, size, nd), 1, window=window)
+        finally:
+            mosaic.close()
+    return out_path
+
+
+def majority_filter(
+    paths: list[str],
+    out_dir: str,
+    size: int = 3,
+    workers: int | None = None,
+    nodata: int | None = None,
+) -> list[str]:
+    """Majority filter every tile into out_dir, the neighbourhood at tile edges is
+    read from the adjacent tiles so the result matches filtering the full mosaic"""
+    if size < 3 or size % 2 == 0:
+        raise ValueError("size must be an odd integer >= 3")
+
+    os.makedirs(out_dir, exist_ok=True)
+    tiles = tile_index(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(
+            pool.map(
+                _tile_majority,
+                tiles,
+                [tiles] * len(tiles),
+                [out_dir] * len(tiles),
+                [size] * len(tiles),
+                [nodata] * len(tiles),
+            )
+        )
@@ -1,28 +1,214 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+
 import ee
 
 
+@dataclass
+class SpectralIndex:
+    """An index written as expressions over band roles i.e. NIR, RED.
+
+    Expressions only use + - * / and parentheses so the same text evaluates in
+    ee.Image.expression and on numpy arrays. Output names may use the roles as
+    format fields i.e. "{NUM}_{DEN}" -> "VV_VH".
+    """
+
+    bands: tuple[str, ...]
+    outputs: dict[str, str]
+    params: dict[str, float] = field(default_factory=dict)
+
+
+INDICES: dict[str, SpectralIndex] = {}
+
+
+def register_index(name: str, index: SpectralIndex) -> SpectralIndex:
+    INDICES[name] = index
+    return index
+
+
+# -- Optical Indices
+register_index(
+    "NDVI", SpectralIndex(("NIR", "RED"), {"NDVI": "(NIR - RED) / (NIR + RED)"})
+)
+register_index(
+    "SAVI",
+    SpectralIndex(
+        ("NIR", "RED"),
+        {"SAVI": "(1 + L) * (NIR - RED) / (NIR + RED + L)"},
+        {"L": 0.5},
+    ),
+)
+register_index(
+    "NDWI", SpectralIndex(("GREEN", "NIR"), {"NDWI": "(GREEN - NIR) / (GREEN + NIR)"})
+)
+register_index(
+    "MNDWI",
+    SpectralIndex(("GREEN", "SWIR1"), {"MNDWI": "(GREEN - SWIR1) / (GREEN + SWIR1)"}),
+)
+register_index(
+    "NDMI",
+    SpectralIndex(("NIR", "SWIR1"), {"NDMI": "(NIR - SWIR1) / (NIR + SWIR1)"}),
+)
+register_index(
+    "TASSELED_CAP",
+    SpectralIndex(
+        ("BLUE", "GREEN", "RED", "NIR", "SWIR1", "SWIR2"),
+        {
+            "brightness": "0.3029 * BLUE + 0.2786 * GREEN + 0.4733 * RED + 0.5599 * NIR + 0.508 * SWIR1 + 0.1872 * SWIR2",
+            "greenness": "-0.2941 * BLUE - 0.243 * GREEN - 0.5424 * RED + 0.7276 * NIR + 0.0713 * SWIR1 - 0.1608 * SWIR2",
+            "wetness": "0.1511 * BLUE + 0.1973 * GREEN + 0.3283 * RED + 0.3407 * NIR - 0.7117 * SWIR1 - 0.4559 * SWIR2",
+        },
+    ),
+)
+
+# -- Radar Indices
+register_index("RATIO", SpectralIndex(("NUM", "DEN"), {"{NUM}_{DEN}": "NUM / DEN"}))
+
+
+class IndexExpression:
+    """Compiles a set of registered indices over a band mapping into one fused
+    expression set, built once and applied per image on either backend.
+
+    Each role is bound to its band in every suffix (season) at once and the
+    expressions run band-wise, so the number of expressions depends on the
+    indices requested and not on the number of suffixes. Inputs are cast to
+    float so integer bands give the same result on both backends.
+
+    Args:
+        names (list[str]): registered index names
+        bands (dict[str, str]): band role -> band name i.e. {"NIR": "B8", "RED": "B4"}
+        suffixes (list[str]): band name suffixes to repeat the indices over, the
+            data cube seasons are "", "_1", "_2"
+        params (dict[str, float]): overrides for index parameters i.e. {"L": 0.5}
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        bands: dict[str, str],
+        suffixes: list[str] = None,
+        params: dict[str, float] = None,
+    ) -> None:
+        self.suffixes = suffixes or [""]
+        params = params or {}
+
+        # role -> band name for each suffix
+        self.inputs: dict[str, list[str]] = {}
+        # (index position, output name, expression over the roles)
+        self.terms: list[tuple[int, str, str]] = []
+        for position, name in enumerate(names):
+            if name not in INDICES:
+                raise KeyError(f"Unknown index: {name}")
+            index = INDICES[name]
+            missing = [role for role in index.bands if role not in bands]
+            if missing:
+                raise ValueError(f"{name} is missing band roles: {missing}")
+
+            values = {**index.params, **params}
+            for role in index.bands:
+                self.inputs[role] = [
+                    f"{bands[role]}{suffix}" for suffix in self.suffixes
+                ]
+            for out, expr in index.outputs.items():
+                out = out.format(**{role: bands[role] for role in index.bands})
+                self.terms.append((position, out, self._substitute(expr, values)))
+
+    @staticmethod
+    def _substitute(expr: str, values: dict) -> str:
+        def replace(match: re.Match) -> str:
+            token = match.group(0)
+            if token in values:
+                return f"({values[token]!r})"
+            return token
+
+        return re.sub(r"[A-Za-z_][A-Za-z0-9_]*", replace, expr)
+
+    @property
+    def names(self) -> list[str]:
+        """Output band names, grouped by index then suffix i.e. NDVI, NDVI_1, ..."""
+        names = []
+        for position in dict.fromkeys(position for position, _, _ in self.terms):
+            outputs = [out for p, out, _ in self.terms if p == position]
+            for suffix in self.suffixes:
+                names.extend(f"{out}{suffix}" for out in outputs)
+        return names
+
+    def _term_names(self) -> list[str]:
+        return [
+            f"{out}{suffix}" for _, out, _ in self.terms for suffix in self.suffixes
+        ]
+
+    def apply_ee(self, image: ee.Image) -> ee.Image:
+        """Index bands for an ee.Image, input bands are selected and cast once and
+        each expression covers every suffix"""
+        selected = [band for bands in self.inputs.values() for band in bands]
+        renamed = [
+            f"{role}_{idx}"
+            for role, bands in self.inputs.items()
+            for idx in range(len(bands))
+        ]
+        stack = image.select(selected, renamed).toFloat()
+        inputs = {
+            role: stack.select([f"{role}_{idx}" for idx in range(len(bands))])
+            for role, bands in self.inputs.items()
+        }
+        return (
+            ee.Image.cat([stack.expression(expr, inputs) for _, _, expr in self.terms])
+            .rename(self._term_names())
+            .select(self.names)
+        )
+
+    def apply_local(self, arrays: dict) -> dict:
+        """Index arrays from a mapping of band name -> numpy array, all outputs are
+        evaluated from a single compiled expression"""
+        import numpy as np
+
+        if not hasattr(self, "_code"):
+            fused = "(" + "".join(f"{expr}, " for _, _, expr in self.terms) + ")"
+            self._code = compile(fused, "<indices>", "eval")
+
+        inputs = {
+            role: np.stack(
+                [np.asarray(arrays[band], dtype=np.float64) for band in bands]
+            )
+            for role, bands in self.inputs.items()
+        }
+        with np.errstate(divide="ignore", invalid="ignore"):
+            results = eval(self._code, {"__builtins__": {}}, inputs)
+        outputs = {
+            f"{out}{suffix}": result[idx]
+            for (_, out, _), result in zip(self.terms, results)
+            for idx, suffix in enumerate(self.suffixes)
+        }
+        return {name: outputs[name] for name in self.names}
+
+
+def compute_indices(
+    names: list[str],
+    bands: dict[str, str],
+    suffixes: list[str] = None,
+    params: dict[str, float] = None,
+):
+    """Map-able function that adds all requested indices in a single step"""
+    fused = IndexExpression(names, bands, suffixes, params)
+    return lambda image: image.addBands(fused.apply_ee(image))
+
+
 # -- Optical Calculations
 def compute_ndvi_from_expression(image: ee.Image, nir: str, red: str, name: str = None) -> ee.Image:
     name = name or "NDVI"
-    return image.expression(
-            "(NIR - RED) / (NIR + RED)",
-            {"NIR": image.select(nir), "RED": image.select(red)},
-        ).rename(name)
+    return IndexExpression(["NDVI"], {"NIR": nir, "RED": red}).apply_ee(image).rename(name)
 
 
 def compute_savi_from_expression(nir: str, red: str, L: float = 0.5, name: str = None):
     name = name or "SAVI"
-    return lambda image: image.addBands(
-        image.expression(
-            "(1 + L) * (NIR - RED) / (NIR + RED + L)",
-            {"NIR": image.select(nir), "RED": image.select(red), "L": L},
-        ).rename(name)
-    )
+    fused = IndexExpression(["SAVI"], {"NIR": nir, "RED": red}, params={"L": L})
+    return lambda image: image.addBands(fused.apply_ee(image).rename(name))
 
 
 # -- Radar Calculations
 def compute_ratio_from_expression(b1: str, b2: str, name: str = None):
     name = name or f"{b1}_{b2}"
-    return lambda image: image.addBands(
-        image.select(b1).divide(image.select(b2)).rename(name)
-    )
\ No newline at end of file
+    fused = IndexExpression(["RATIO"], {"NUM": b1, "DEN": b2})
+    return lambda image: image.addBands(fused.apply_ee(image).rename(name))
@@ -5,6 +5,8 @@ from typing import Any
 
 import ee
 
+from . import rmath
+
 
 @dataclass
 class RemoteSensingDataset:
@@ -12,6 +14,34 @@ class RemoteSensingDataset:
     aoi: Any = field(default=None)
 
 
+# sentinel 2 band roles for the registered indices
+S2_BANDS = {
+    "BLUE": "B2",
+    "GREEN": "B3",
+    "RED": "B4",
+    "NIR": "B8",
+    "SWIR1": "B11",
+    "SWIR2": "B12",
+}
+
+# alos yearly mosaics used as inputs, (start, end) with end exclusive
+ALOS_ID = "JAXA/ALOS/PALSAR/YEARLY/SAR"
+ALOS_DATES = ("2018", "2021")
+
+# default sentinel 1 compositing windows, (start, end) with end exclusive
+S1_WINDOWS = [("2017-01-01", "2017-12-31"), ("2018-01-01", "2018-12-31")]
+
+
+def window_band_names(bands: list[str], n_windows: int) -> list[str]:
+    """Band names for a stack of windowed composites, the first window keeps the
+    original names and each following window gets a _1, _2, ... suffix"""
+    return [
+        band if idx == 0 else f"{band}_{idx}"
+        for idx in range(n_windows)
+        for band in bands
+    ]
+
+
 class RemoteSensingDatasetProcessor:
     def __init__(self, arg=None) -> None:
         self.dataset = arg
@@ -22,14 +52,19 @@ class RemoteSensingDatasetProcessor:
 
     @dataset.setter
     def dataset(self, arg):
-        # use case str,  list[str] or None
+        # use case str,  list[str], ee.ImageCollection or None
         if arg is None:
             self._dataset = None
+        elif isinstance(arg, ee.ImageCollection):
+            self._dataset = arg
         elif isinstance(arg, str):
             self._dataset = ee.ImageCollection(arg)
-        elif isinstance(arg, list):
-            if all(isinstance(element, str) for element in arg):
-                self._dataset = ee.ImageCollection(arg)
+        elif isinstance(arg, list) and all(isinstance(element, str) for element in arg):
+            self._dataset = ee.ImageCollection(arg)
+        else:
+            raise TypeError(
+                "dataset must be a str, list[str], ee.ImageCollection or None"
+            )
 
     def filter_dates(self, start, end):
         self._dataset = self._dataset.filterDate(start, end)
@@ -54,60 +89,87 @@ class RemoteSensingDatasetProcessor:
         )
         return self
 
-    def add_ratio(self, b1, b2):
+    def add_indices(
+        self,
+        names: list[str],
+        bands: dict[str, str],
+        suffixes: list[str] = None,
+        params: dict[str, float] = None,
+    ):
+        """Add registered indices (see rmath.INDICES) in a single map over the dataset"""
         self._dataset = self._dataset.map(
-            lambda x: x.addBands(x.select(b1).divide(x.select(b2)).rename(f"{b1}_{b2}"))
+            rmath.compute_indices(names, bands, suffixes, params)
         )
         return self
 
+    def add_ratio(self, b1, b2):
+        return self.add_indices(["RATIO"], {"NUM": b1, "DEN": b2})
+
     def add_ndvi(self, nir, red):
-        self._dataset = self._dataset.map(
-            lambda x: x.addBands(x.normalizedDifference([nir, red]).rename("NDVI"))
-        )
-        return self
+        return self.add_indices(["NDVI"], {"NIR": nir, "RED": red})
 
     def add_savi(self, nir, red, L: float = 0.5):
-        self._dataset = self._dataset.map(
-            lambda image: image.addBands(
-                image.expression(
-                    "(1 + L) * (NIR - RED) / (NIR + RED + L)",
-                    {"NIR": image.select(nir), "RED": image.select(red), "L": L},
-                ).rename("SAVI")
-            )
-        )
-        return self
+        return self.add_indices(["SAVI"], {"NIR": nir, "RED": red}, params={"L": L})
 
     def add_tasseled_cap(
         self, blue: str, green: str, red: str, nir: str, swir1: str, swir2: str
     ):
-        def compute(image: ee.Image):
-            coefficients = ee.Array(
-                [
-                    [0.3029, 0.2786, 0.4733, 0.5599, 0.508, 0.1872],
-                    [-0.2941, -0.243, -0.5424, 0.7276, 0.0713, -0.1608],
-                    [0.1511, 0.1973, 0.3283, 0.3407, -0.7117, -0.4559],
-                    [-0.8239, 0.0849, 0.4396, -0.058, 0.2013, -0.2773],
-                    [-0.3294, 0.0557, 0.1056, 0.1855, -0.4349, 0.8085],
-                    [0.1079, -0.9023, 0.4119, 0.0575, -0.0259, 0.0252],
-                ]
-            )
-
-            image_inpt = image.select([blue, green, red, nir, swir1, swir2])
-            array_image = image_inpt.toArray()
-            array_image_2d = array_image.toArray(1)
-
-            components = (
-                ee.Image(coefficients)
-                .matrixMultiply(array_image_2d)
-                .arrayProject([0])
-                .arrayFlatten(
-                    [["brightness", "greenness", "wetness", "fourth", "fifth", "sixth"]]
+        bands = {
+            "BLUE": blue,
+            "GREEN": green,
+            "RED": red,
+            "NIR": nir,
+            "SWIR1": swir1,
+            "SWIR2": swir2,
+        }
+        return self.add_indices(["TASSELED_CAP"], bands)
+
+    def composite_windows(
+        self, windows: list[tuple[str, str]], bands: list[str] = None
+    ):
+        """Group the dataset into date windows with a single join and mosaic each
+        group, the dataset becomes one composite per window in window order.
+
+        When bands are given, windows without any images get fully masked float
+        bands of those names so every composite has the same bands.
+        """
+        windows_fc = ee.FeatureCollection(
+            [
+                ee.Feature(
+                    None,
+                    {
+                        "window": idx,
+                        "start": ee.Date(start).millis(),
+                        "end": ee.Date(end).millis(),
+                    },
                 )
+                for idx, (start, end) in enumerate(windows)
+            ]
+        )
+        in_window = ee.Filter.And(
+            ee.Filter.lessThanOrEquals(leftField="start", rightField="system:time_start"),
+            ee.Filter.greaterThan(leftField="end", rightField="system:time_start"),
+        )
+        joined = ee.Join.saveAll(matchesKey="images", outer=True).apply(
+            windows_fc, self._dataset, in_window
+        )
+        empty = None
+        if bands is not None:
+            empty = (
+                ee.Image.constant([0] * len(bands))
+                .rename(bands)
+                .toFloat()
+                .updateMask(0)
             )
-            components = components.select(["brightness", "greenness", "wetness"])
-            return image.addBands(components)
 
-        self._dataset = self._dataset.map(compute)
+        def composite(window: ee.Feature) -> ee.Image:
+            images = ee.ImageCollection.fromImages(window.get("images"))
+            if empty is not None:
+                # mosaic puts the last image on top, the masked fill sits underneath
+                images = ee.ImageCollection([empty]).merge(images.select(bands))
+            return images.mosaic().set("window", window.get("window"))
+
+        self._dataset = ee.ImageCollection(joined.map(composite))
         return self
 
     def build(self) -> ee.ImageCollection:
@@ -119,9 +181,17 @@ class RemoteSensingDatasetProcessing:
         self.processor = RemoteSensingDatasetProcessor()
 
     def s1_processing(
-        self, dataset: RemoteSensingDataset
-    ) -> tuple[ee.ImageCollection, ee.ImageCollection]:
+        self,
+        dataset: RemoteSensingDataset,
+        windows: list[tuple[str, str]] | None = None,
+    ) -> ee.Image:
+        """Composite sentinel 1 for each (start, end) date window in a single pass.
+
+        Bands are VV, VH, VV_VH for the first window and VV_1, VH_1, VV_VH_1 ...
+        for the following windows.
+        """
         self.processor.dataset = dataset.dataset_id
+        windows = windows or S1_WINDOWS
 
         BANDS = ["VV", "VH"]
         proc = (
@@ -129,11 +199,13 @@ class RemoteSensingDatasetProcessing:
             .select(BANDS)
             .add_box_car(1)
             .add_ratio(b1="VV", b2="VH")
+            .composite_windows(windows, bands=BANDS + ["VV_VH"])
             .build()
         )
 
-        return proc.filterDate("2017-01-01", "2017-12-31"), proc.filterDate(
-            "2018-01-01", "2018-12-31"
+        # windows without scenes come through as masked bands
+        return proc.toBands().rename(
+            window_band_names(BANDS + ["VV_VH"], len(windows))
         )
 
     def data_cube_processing(self, dataset: RemoteSensingDataset) -> ee.ImageCollection:
@@ -148,15 +220,9 @@ class RemoteSensingDatasetProcessing:
             self.processor.filter_bounds(dataset.aoi)
             .select(b_pattern)
             .select(new_band_names, remap=True)
-            .add_ndvi("B8", "B4")
-            .add_ndvi("B8_1", "B4_1")
-            .add_ndvi("B8_2", "B4_2")
-            .add_savi("B8", "B4")
-            .add_savi("B8_1", "B4_1")
-            .add_savi("B8_2", "B4_2")
-            .add_tasseled_cap("B2", "B3", "B4", "B8", "B11", "B12")
-            .add_tasseled_cap("B2_1", "B3_1", "B4_1", "B8_1", "B11_1", "B12_1")
-            .add_tasseled_cap("B2_2", "B3_2", "B4_2", "B8_2", "B11_2", "B12_2")
+            .add_indices(
+                ["NDVI", "SAVI", "TASSELED_CAP"], S2_BANDS, suffixes=["", "_1", "_2"]
+            )
             .build()
         )
         return proc
@@ -164,7 +230,7 @@ class RemoteSensingDatasetProcessing:
     def alos_processing(self, dataset: RemoteSensingDataset) -> ee.ImageCollection:
         self.processor.dataset = dataset.dataset_id
         return (
-            self.processor.filter_dates("2018", "2021")
+            self.processor.filter_dates(*ALOS_DATES)
             .filter_bounds(dataset.aoi)
             .select("H.*")
             .add_box_car(1)
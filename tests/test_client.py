@@ -0,0 +1,173 @@
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cnwi.client import Client, TokenBucket, is_retryable
+
+
+class FakeEndpoint:
+    """Local HTTP server that answers with queued failure codes before succeeding"""
+
+    def __init__(self, failures=None, delay=0.0):
+        self.failures = list(failures or [])
+        self.delay = delay
+        self.hits = 0
+        self.lock = threading.Lock()
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with endpoint.lock:
+                    endpoint.hits += 1
+                    code = endpoint.failures.pop(0) if endpoint.failures else 200
+                time.sleep(endpoint.delay)
+                self.send_response(code)
+                self.end_headers()
+                self.wfile.write(b"ok" if code == 200 else b"error")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def get(self):
+        with urllib.request.urlopen(self.url, timeout=5) as resp:
+            return resp.read()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ClientTests(unittest.TestCase):
+    def make_endpoint(self, *args, **kwargs):
+        endpoint = FakeEndpoint(*args, **kwargs)
+        self.addCleanup(endpoint.close)
+        return endpoint
+
+    def make_client(self, **kwargs):
+        kwargs = {"rate": 1000, "backoff": 0.01, "max_backoff": 0.05, **kwargs}
+        client = Client(**kwargs)
+        self.addCleanup(client.shutdown)
+        return client
+
+    def test_retries_transient_errors(self):
+        endpoint = self.make_endpoint(failures=[429, 503, 500])
+        client = self.make_client()
+        self.assertEqual(client.call(endpoint.get), b"ok")
+        self.assertEqual(endpoint.hits, 4)
+        self.assertEqual(client.metrics.retries, 3)
+        self.assertEqual(client.metrics.failures, 0)
+
+    def test_gives_up_after_max_retries(self):
+        endpoint = self.make_endpoint(failures=[503] * 10)
+        client = self.make_client(max_retries=2)
+        with self.assertRaises(urllib.error.HTTPError):
+            client.call(endpoint.get)
+        self.assertEqual(endpoint.hits, 3)
+        self.assertEqual(client.metrics.failures, 1)
+
+    def test_does_not_retry_client_errors(self):
+        endpoint = self.make_endpoint(failures=[404])
+        client = self.make_client()
+        with self.assertRaises(urllib.error.HTTPError):
+            client.call(endpoint.get)
+        self.assertEqual(endpoint.hits, 1)
+        self.assertEqual(client.metrics.retries, 0)
+
+    def test_coalesces_identical_calls(self):
+        endpoint = self.make_endpoint(delay=0.2)
+        client = self.make_client()
+        futures = [client.submit(endpoint.get, key="same") for _ in range(5)]
+        self.assertEqual([f.result() for f in futures], [b"ok"] * 5)
+        self.assertEqual(endpoint.hits, 1)
+        self.assertEqual(client.metrics.coalesced, 4)
+        # once finished the key is released
+        client.call(endpoint.get, key="same")
+        self.assertEqual(endpoint.hits, 2)
+
+    def test_bounded_workers(self):
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        client = self.make_client(max_workers=2)
+        with ThreadPoolExecutor(max_workers=6) as callers:
+            list(callers.map(lambda _: client.call(work), range(6)))
+        self.assertLessEqual(peak, 2)
+
+    def test_rate_limit_throttles(self):
+        endpoint = self.make_endpoint()
+        client = self.make_client(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            client.call(endpoint.get)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertGreater(client.metrics.throttled, 0)
+
+    def test_timeout(self):
+        endpoint = self.make_endpoint(delay=0.5)
+        client = self.make_client(timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            client.call(endpoint.get)
+        self.assertEqual(client.metrics.timeouts, 1)
+
+    def test_timeout_releases_coalesced_key(self):
+        endpoint = self.make_endpoint(delay=0.5)
+        client = self.make_client(timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            client.call(endpoint.get, key="slow")
+        endpoint.delay = 0.0
+        client.timeout = 1.0
+        self.assertEqual(client.call(endpoint.get, key="slow"), b"ok")
+        self.assertEqual(client.metrics.coalesced, 0)
+
+    def test_summary(self):
+        client = self.make_client()
+        client.call(lambda: None)
+        self.assertIn("EE calls: 1", client.metrics.summary())
+
+
+class RetryableTests(unittest.TestCase):
+    def test_message_codes(self):
+        self.assertTrue(is_retryable(Exception("Too many concurrent aggregations.")))
+        self.assertTrue(is_retryable(Exception("HTTP Error 503")))
+        self.assertFalse(is_retryable(Exception("Image.select: Pattern 'B1' did not match")))
+        self.assertFalse(is_retryable(Exception("Asset storage quota exceeded.")))
+
+    def test_status_code_needs_http_context(self):
+        self.assertTrue(is_retryable(Exception("Error 429: Too Many Requests")))
+        self.assertTrue(is_retryable(Exception("HTTP Error 502: Bad Gateway")))
+        self.assertFalse(
+            is_retryable(
+                Exception(
+                    "Image.reduceRegion: Too many pixels in the region. "
+                    "Found 1234567, but maxPixels allows only 500."
+                )
+            )
+        )
+        self.assertFalse(is_retryable(Exception("Collection query aborted after 503 elements.")))
+
+    def test_token_bucket_burst(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import ee
+from cnwi.geometry import clear_cache, count_vertices, prepare_geometry
+
+
+class PrepareGeometryTests(unittest.TestCase):
+    def setUp(self):
+        ee.Initialize()
+        clear_cache()
+        # jagged "coastline" with many vertices
+        coords = [
+            [x / 1000, 0.001 * (x % 2)] for x in range(0, 1001)
+        ] + [[1, 1], [0, 1], [0, 0]]
+        self.geometry = ee.Geometry.Polygon([coords])
+
+    def test_vertex_counts_drop(self):
+        prepared = prepare_geometry(self.geometry, max_error=500)
+        counts = prepared.vertex_counts()
+        self.assertLess(counts["simplified"], counts["exact"])
+        self.assertEqual(counts["bounds"], 5)
+
+    def test_cached(self):
+        first = prepare_geometry(self.geometry, max_error=500)
+        self.assertIs(prepare_geometry(self.geometry, max_error=500), first)
+        self.assertIsNot(prepare_geometry(self.geometry, max_error=50), first)
+
+    def test_bounds_contains_exact(self):
+        prepared = prepare_geometry(self.geometry)
+        self.assertTrue(prepared.bounds.contains(prepared.exact, 1).getInfo())
+
+    def test_cover_contains_exact(self):
+        prepared = prepare_geometry(self.geometry, max_error=500)
+        self.assertTrue(prepared.cover().contains(prepared.exact, 1).getInfo())
+
+    def test_mask_skips_union(self):
+        features = ee.FeatureCollection(
+            [ee.Feature(self.geometry), ee.Feature(ee.Geometry.Rectangle([2, 0, 3, 1]))]
+        )
+        prepared = prepare_geometry(features, max_error=500)
+        tile = ee.Geometry.Rectangle([2.2, 0.2, 2.8, 0.8])
+        masked = prepared.mask(ee.Image.constant(1), tile)
+        self.assertNotIn("Collection.geometry", masked.serialize())
+        value = masked.reduceRegion(ee.Reducer.first(), ee.Geometry.Point(2.5, 0.5), 10)
+        self.assertEqual(value.getInfo()["constant"], 1)
+
+    def test_prepared_geometries_are_literal(self):
+        prepared = prepare_geometry(self.geometry, max_error=500)
+        self.assertIn('"type"', prepared.bounds.serialize())
+        self.assertNotIn("Geometry.bounds", prepared.bounds.serialize())
+
+    def test_zero_tolerance_is_kept(self):
+        self.assertEqual(prepare_geometry(self.geometry, max_error=0).max_error, 0)
+
+    def test_count_vertices(self):
+        rect = ee.Geometry.Rectangle([0, 0, 1, 1])
+        self.assertEqual(count_vertices(rect).getInfo(), 5)
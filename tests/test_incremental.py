@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+from cnwi.incremental import Manifest, tile_key, tile_prefix
+
+
+class ManifestTests(unittest.TestCase):
+    def setUp(self):
+        self.manifest = Manifest(
+            tiles={
+                "0,0": ["s1/a@1", "dc/a@1"],
+                "0,1": ["s1/b@1", "dc/a@1"],
+                "1,0": ["dc/b@1"],
+            }
+        )
+
+    def test_first_run_changes_everything(self):
+        current = {"0,0": ["dc/a@1"], "0,1": ["dc/a@1"]}
+        self.assertEqual(Manifest().changed(current), ["0,0", "0,1"])
+
+    def test_unchanged(self):
+        self.assertEqual(self.manifest.changed(dict(self.manifest.tiles)), [])
+
+    def test_updated_new_and_removed_inputs(self):
+        current = {
+            "0,0": ["s1/a@1", "dc/a@2"],  # updated version
+            "0,1": ["s1/b@1", "dc/a@1"],
+            "1,0": ["s1/c@1", "dc/b@1"],  # new scene
+        }
+        self.assertEqual(self.manifest.changed(current), ["0,0", "1,0"])
+        current["0,1"] = ["dc/a@1"]  # removed scene
+        self.assertIn("0,1", self.manifest.changed(current))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "manifest.json")
+            self.manifest.update({"2,2": ["dc/c@1"]}).save(filename)
+            loaded = Manifest.load(filename)
+        self.assertEqual(loaded, self.manifest)
+        self.assertIn("2,2", loaded.tiles)
+
+    def test_load_missing(self):
+        self.assertEqual(Manifest.load("does-not-exist.json"), Manifest())
+
+    def test_update_records_prefix(self):
+        self.manifest.update({"0,0": ["dc/a@2"]}, {"0,0": "wet-0_0-run2-"})
+        self.assertEqual(self.manifest.tiles["0,0"], ["dc/a@2"])
+        self.assertEqual(self.manifest.prefixes["0,0"], "wet-0_0-run2-")
+
+    def test_current_files_drop_superseded(self):
+        self.manifest.update(
+            {},
+            {
+                "0,0": tile_prefix("wet", "0,0", "run2"),
+                "0,1": tile_prefix("wet", "0,1", "run1"),
+            },
+        )
+        paths = [
+            "dl/wet-0_0-run1-0000000000-0000000000.tif",
+            "dl/wet-0_0-run2-0000000000-0000000000.tif",
+            "dl/wet-0_1-run1-0000000000-0000000000.tif",
+        ]
+        self.assertEqual(self.manifest.current_files(paths), paths[1:])
+
+    def test_load_old_manifest_without_prefixes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "manifest.json")
+            with open(filename, "w") as f:
+                f.write('{"tiles": {"0,0": ["dc/a@1"]}, "tile_scale": 20480}')
+            self.assertEqual(Manifest.load(filename).prefixes, {})
+
+    def test_tile_key(self):
+        self.assertEqual(tile_key("-12,34"), "m12_34")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,12 @@
 import unittest
 import ee
 from cnwi.rsd import RemoteSensingDatasetProcessor
+from cnwi.modeling import (
+    HyperParameters,
+    ShardedSmileRandomForest,
+    SmileRandomForest,
+    shard_trees,
+)
 
 
 class TestSmileRandomForest(unittest.TestCase):
@@ -12,3 +18,86 @@ class TestSmileRandomForest(unittest.TestCase):
 
     def test_fit(self):
         pass
+
+
+class TestShardedSmileRandomForest(unittest.TestCase):
+    def test_shard_trees_sum(self):
+        self.assertEqual(shard_trees(1000, 3), [334, 333, 333])
+        self.assertEqual(sum(shard_trees(1000, 7)), 1000)
+
+    def test_shard_trees_bounds(self):
+        with self.assertRaises(ValueError):
+            shard_trees(10, 0)
+        with self.assertRaises(ValueError):
+            shard_trees(10, 11)
+
+    def test_weights_follow_tree_counts(self):
+        rf = ShardedSmileRandomForest(HyperParameters(numberOfTrees=10), shards=4)
+        self.assertEqual(rf.trees, [3, 3, 2, 2])
+        # vote fractions scaled back to tree votes
+        self.assertEqual(rf._weights(), [3.0, 3.0, 2.0, 2.0])
+        rf = ShardedSmileRandomForest(
+            HyperParameters(numberOfTrees=10), shards=4, combine="probability"
+        )
+        self.assertAlmostEqual(sum(rf._weights()), 1.0)
+
+    def test_invalid_combine(self):
+        with self.assertRaises(ValueError):
+            ShardedSmileRandomForest(combine="average")
+
+    def test_requires_classes(self):
+        for combine in ShardedSmileRandomForest.COMBINE:
+            with self.assertRaises(ValueError):
+                ShardedSmileRandomForest.load_model("asset", shards=2, combine=combine)
+            rf = ShardedSmileRandomForest(shards=2, combine=combine)
+            with self.assertRaises(ValueError):
+                rf.predict(None)
+
+
+class TestShardedSmileRandomForestPredict(unittest.TestCase):
+    def setUp(self) -> None:
+        ee.Initialize()
+        # two well separated classes over three predictors
+        self.features = ee.FeatureCollection(
+            [
+                ee.Feature(None, {"b1": v, "b2": v * 2, "b3": v * 3, "class_name": c})
+                for c, base in [(3, 0), (7, 100)]
+                for v in range(base, base + 20)
+            ]
+        )
+        self.image = ee.Image.constant([110, 220, 330]).rename(["b1", "b2", "b3"])
+        self.hyper = HyperParameters(numberOfTrees=10)
+
+    def classify_image(self, combine):
+        rf = ShardedSmileRandomForest(self.hyper, shards=2, combine=combine)
+        rf.fit(self.features, "class_name", ["b1", "b2", "b3"])
+        predicted = rf.predict(self.image)
+        self.assertEqual(predicted.bandNames().getInfo(), ["classification"])
+        return predicted.reduceRegion(
+            ee.Reducer.first(), ee.Geometry.Point(0, 0), 10
+        ).getInfo()["classification"]
+
+    def test_predict_multi_band_image_vote(self):
+        self.assertEqual(self.classify_image("vote"), 7)
+
+    def test_predict_multi_band_image_probability(self):
+        self.assertEqual(self.classify_image("probability"), 7)
+
+    def test_predict_features_keeps_classification(self):
+        rf = ShardedSmileRandomForest(self.hyper, shards=2)
+        rf.fit(self.features, "class_name", ["b1", "b2", "b3"])
+        predicted = rf.predict(self.features).first().propertyNames().getInfo()
+        self.assertIn("classification", predicted)
+        self.assertNotIn("classification_0", predicted)
+
+    def test_assess_and_matches(self):
+        for combine in ShardedSmileRandomForest.COMBINE:
+            rf = ShardedSmileRandomForest(self.hyper, shards=2, combine=combine)
+            rf.fit(self.features, "class_name", ["b1", "b2", "b3"])
+            self.assertEqual(rf.assess(self.features).cfm.accuracy().getInfo(), 1)
+            monolithic = SmileRandomForest(self.hyper).fit(
+                self.features, "class_name", ["b1", "b2", "b3"]
+            )
+            ok, ensemble, single = rf.matches(monolithic, self.features)
+            self.assertTrue(ok)
+            self.assertEqual(ensemble, single)
@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from cnwi.postprocessing import (
+    class_areas,
+    majority,
+    majority_filter,
+    regions_in_bounds,
+    tile_index,
+    zonal_stats,
+)
+
+
+def write_tile(
+    path, data, row, col, res=10.0, crs="EPSG:32618", origin=(500000, 5000000)
+):
+    x, y = origin
+    transform = from_origin(x + col * res, y - row * res, res, res)
+    profile = {
+        "driver": "GTiff",
+        "height": data.shape[0],
+        "width": data.shape[1],
+        "count": 1,
+        "dtype": "uint8",
+        "crs": crs,
+        "transform": transform,
+        "nodata": 0,
+        "tiled": True,
+        "blockxsize": 16,
+        "blockysize": 16,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+
+
+class PostProcessingTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        # 2 x 2 grid of 32 x 48 tiles
+        self.mosaic = rng.integers(0, 5, size=(64, 96), dtype=np.uint8)
+        self.paths = []
+        for i in range(2):
+            for j in range(2):
+                path = os.path.join(self.tmp.name, f"tile-{i}-{j}.tif")
+                data = self.mosaic[i * 32 : (i + 1) * 32, j * 48 : (j + 1) * 48]
+                write_tile(path, data, i * 32, j * 48)
+                self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tile_index(self):
+        offsets = sorted((t.row, t.col) for t in tile_index(self.paths))
+        self.assertEqual(offsets, [(0, 0), (0, 48), (32, 0), (32, 48)])
+
+    def test_class_areas(self):
+        totals = class_areas(self.paths, workers=2)
+        values, counts = np.unique(self.mosaic[self.mosaic != 0], return_counts=True)
+        self.assertEqual(list(totals), values.tolist())
+        for value, count in zip(values, counts):
+            self.assertEqual(totals[value]["pixels"], count)
+            self.assertAlmostEqual(totals[value]["area"], count * 100.0)
+
+    def test_class_areas_geographic(self):
+        path = os.path.join(self.tmp.name, "geo.tif")
+        write_tile(
+            path, np.ones((2, 10), dtype=np.uint8), 0, 0, 1.0, "EPSG:4326", (0, 1)
+        )
+        # 1 degree cells at the equator are ~111 km a side
+        area = class_areas([path], workers=1)[1]["area"] / 20
+        self.assertAlmostEqual(area / 1e6, 111.2**2, delta=150)
+
+    def test_zonal_stats(self):
+        left = {
+            "type": "Polygon",
+            "coordinates": [
+                [
+                    (500000, 5000000),
+                    (500480, 5000000),
+                    (500480, 4999360),
+                    (500000, 4999360),
+                    (500000, 5000000),
+                ]
+            ],
+        }
+        stats = zonal_stats(self.paths, [(left, 7)], workers=2)
+        self.assertEqual(list(stats), [7])
+        block = self.mosaic[:, :48]
+        for value, count in zip(*np.unique(block[block != 0], return_counts=True)):
+            self.assertEqual(stats[7][value]["pixels"], count)
+
+    def test_regions_in_bounds(self):
+        def box(x0, y0, x1, y1):
+            return {
+                "type": "Polygon",
+                "coordinates": [[(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]],
+            }
+
+        regions = [(box(0, 0, 10, 10), 1), (box(20, 20, 30, 30), 2)]
+        selected = regions_in_bounds(regions, (5, 5, 15, 15))
+        self.assertEqual([zone for _, zone in selected], [1])
+
+    def test_zonal_stats_skips_distant_regions(self):
+        far = {
+            "type": "Polygon",
+            "coordinates": [[(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]],
+        }
+        self.assertEqual(zonal_stats(self.paths, [(far, 3)], workers=1), {})
+
+    def test_majority(self):
+        block = np.array(
+            [
+                [1, 1, 2],
+                [1, 2, 2],
+                [1, 1, 0],
+            ],
+            dtype=np.uint8,
+        )
+        self.assertEqual(majority(block, 3, 0).tolist(), [[1]])
+
+    def test_majority_filter_matches_full_mosaic(self):
+        out_dir = os.path.join(self.tmp.name, "smoothed")
+        outputs = majority_filter(self.paths, out_dir, size=3, workers=2)
+
+        expected = majority(np.pad(self.mosaic, 1), 3, 0)
+        for tile, path in zip(tile_index(self.paths), outputs):
+            with rasterio.open(path) as src:
+                result = src.read(1)
+            np.testing.assert_array_equal(
+                result,
+                expected[
+                    tile.row : tile.row + tile.height, tile.col : tile.col + tile.width
+                ],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
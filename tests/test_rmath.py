@@ -0,0 +1,141 @@
+import unittest
+
+import ee
+import numpy as np
+
+from cnwi.rmath import INDICES, IndexExpression, SpectralIndex, register_index
+
+
+S2_BANDS = {
+    "BLUE": "B2",
+    "GREEN": "B3",
+    "RED": "B4",
+    "NIR": "B8",
+    "SWIR1": "B11",
+    "SWIR2": "B12",
+}
+
+
+class IndexExpressionTests(unittest.TestCase):
+    def setUp(self):
+        self.arrays = {
+            "B2": np.array([0.1, 0.2]),
+            "B3": np.array([0.2, 0.3]),
+            "B4": np.array([0.3, 0.1]),
+            "B8": np.array([0.6, 0.5]),
+            "B11": np.array([0.4, 0.2]),
+            "B12": np.array([0.3, 0.1]),
+        }
+
+    def test_names_follow_suffixes(self):
+        fused = IndexExpression(["NDVI", "TASSELED_CAP"], S2_BANDS, ["", "_1"])
+        self.assertEqual(
+            fused.names,
+            [
+                "NDVI",
+                "NDVI_1",
+                "brightness",
+                "greenness",
+                "wetness",
+                "brightness_1",
+                "greenness_1",
+                "wetness_1",
+            ],
+        )
+
+    def test_ratio_name_from_bands(self):
+        fused = IndexExpression(["RATIO"], {"NUM": "VV", "DEN": "VH"})
+        self.assertEqual(fused.names, ["VV_VH"])
+
+    def test_local_values(self):
+        fused = IndexExpression(["NDVI", "SAVI", "NDWI", "MNDWI"], S2_BANDS)
+        result = fused.apply_local(self.arrays)
+        nir, red, green = self.arrays["B8"], self.arrays["B4"], self.arrays["B3"]
+        swir1 = self.arrays["B11"]
+        np.testing.assert_allclose(result["NDVI"], (nir - red) / (nir + red))
+        np.testing.assert_allclose(
+            result["SAVI"], 1.5 * (nir - red) / (nir + red + 0.5)
+        )
+        np.testing.assert_allclose(result["NDWI"], (green - nir) / (green + nir))
+        np.testing.assert_allclose(result["MNDWI"], (green - swir1) / (green + swir1))
+
+    def test_integer_inputs_are_float(self):
+        arrays = {
+            band: (values * 1000).astype(np.int16)
+            for band, values in self.arrays.items()
+        }
+        result = IndexExpression(["NDVI"], S2_BANDS).apply_local(arrays)
+        nir, red = arrays["B8"].astype(float), arrays["B4"].astype(float)
+        np.testing.assert_allclose(result["NDVI"], (nir - red) / (nir + red))
+        self.assertTrue((result["NDVI"] > 0).all())
+
+    def test_local_matches_names_with_suffixes(self):
+        arrays = dict(self.arrays)
+        arrays.update({f"{band}_1": values * 2 for band, values in self.arrays.items()})
+        fused = IndexExpression(["NDVI", "TASSELED_CAP"], S2_BANDS, ["", "_1"])
+        result = fused.apply_local(arrays)
+        self.assertEqual(list(result), fused.names)
+        np.testing.assert_allclose(result["NDVI_1"], result["NDVI"])
+        np.testing.assert_allclose(result["brightness_1"], 2 * result["brightness"])
+
+    def test_param_override(self):
+        fused = IndexExpression(["SAVI"], S2_BANDS, params={"L": 1.0})
+        result = fused.apply_local(self.arrays)
+        nir, red = self.arrays["B8"], self.arrays["B4"]
+        np.testing.assert_allclose(result["SAVI"], 2.0 * (nir - red) / (nir + red + 1.0))
+
+    def test_tasseled_cap_matches_coefficients(self):
+        result = IndexExpression(["TASSELED_CAP"], S2_BANDS).apply_local(self.arrays)
+        stack = np.stack([self.arrays[S2_BANDS[role]] for role in S2_BANDS])
+        coefficients = np.array(
+            [
+                [0.3029, 0.2786, 0.4733, 0.5599, 0.508, 0.1872],
+                [-0.2941, -0.243, -0.5424, 0.7276, 0.0713, -0.1608],
+                [0.1511, 0.1973, 0.3283, 0.3407, -0.7117, -0.4559],
+            ]
+        )
+        expected = coefficients @ stack
+        for idx, name in enumerate(["brightness", "greenness", "wetness"]):
+            np.testing.assert_allclose(result[name], expected[idx])
+
+    def test_register_index(self):
+        register_index(
+            "GNDVI",
+            SpectralIndex(("NIR", "GREEN"), {"GNDVI": "(NIR - GREEN) / (NIR + GREEN)"}),
+        )
+        self.addCleanup(INDICES.pop, "GNDVI")
+        result = IndexExpression(["GNDVI"], S2_BANDS).apply_local(self.arrays)
+        self.assertEqual(list(result), ["GNDVI"])
+
+    def test_missing_band_role(self):
+        with self.assertRaises(ValueError):
+            IndexExpression(["MNDWI"], {"GREEN": "B3"})
+
+    def test_unknown_index(self):
+        with self.assertRaises(KeyError):
+            IndexExpression(["NOPE"], S2_BANDS)
+
+
+class IndexExpressionEETests(unittest.TestCase):
+    def setUp(self):
+        ee.Initialize()
+
+    def test_integer_bands_are_float(self):
+        image = ee.Image.constant([600, 300]).rename(["B8", "B4"]).toInt16()
+        ndvi = IndexExpression(["NDVI"], {"NIR": "B8", "RED": "B4"}).apply_ee(image)
+        value = ndvi.reduceRegion(
+            ee.Reducer.first(), ee.Geometry.Point(0, 0), 10
+        ).getInfo()["NDVI"]
+        self.assertAlmostEqual(value, 1 / 3, places=5)
+
+    def test_band_names_with_suffixes(self):
+        bands = ["B2", "B3", "B4", "B8", "B11", "B12"]
+        image = ee.Image.constant(list(range(1, 13))).rename(
+            bands + [f"{band}_1" for band in bands]
+        )
+        fused = IndexExpression(["NDVI", "TASSELED_CAP"], S2_BANDS, ["", "_1"])
+        self.assertEqual(fused.apply_ee(image).bandNames().getInfo(), fused.names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ from cnwi.rsd import (
     RemoteSensingDatasetProcessor,
     RemoteSensingDataset,
     RemoteSensingDatasetProcessing,
+    window_band_names,
 )
 
 
@@ -100,6 +101,40 @@ class RemoteSensingDatasetProcessorTests(unittest.TestCase):
         rsdp.dataset = dataset
         rsdp.filter_bounds(ee.Geometry.Point(0, 0))
 
+    def test_composite_windows(self):
+        dated = self.collection.map(
+            lambda x: x.set("system:time_start", ee.Date("2022-01-15").millis())
+        )
+        windows = [("2022-01-01", "2022-02-01"), ("2022-02-01", "2022-03-01")]
+        processed_dataset = (
+            RemoteSensingDatasetProcessor(dated).composite_windows(windows).build()
+        )
+        # Assert one composite per window
+        self.assertEqual(processed_dataset.size().getInfo(), 2)
+
+    def test_composite_windows_empty_window(self):
+        dated = self.collection.map(
+            lambda x: x.set("system:time_start", ee.Date("2022-01-15").millis())
+        )
+        windows = [("2022-01-01", "2022-02-01"), ("2023-01-01", "2023-02-01")]
+        bands = [f"B_{x}" for x in range(1, 7)]
+        stacked = (
+            RemoteSensingDatasetProcessor(dated)
+            .composite_windows(windows, bands=bands)
+            .build()
+            .toBands()
+        )
+        # Assert the empty window still contributes its (masked) bands
+        self.assertEqual(stacked.bandNames().size().getInfo(), 12)
+
+    def test_set_dataset_invalid_type(self):
+        with self.assertRaises(TypeError):
+            RemoteSensingDatasetProcessor(1)
+
+    def test_window_band_names(self):
+        names = window_band_names(["VV", "VH"], 3)
+        self.assertEqual(names, ["VV", "VH", "VV_1", "VH_1", "VV_2", "VH_2"])
+
 
 class TestRemoteSensingDatasetProcessing(unittest.TestCase):
     def setUp(self):
@@ -115,3 +150,15 @@ class TestRemoteSensingDatasetProcessing(unittest.TestCase):
 
         s1_dataset = RemoteSensingDataset(dataset_id=self.dataset, aoi=self.aoi)
         processing = RemoteSensingDatasetProcessing().s1_processing(dataset=s1_dataset)
+        self.assertEqual(
+            processing.bandNames().getInfo(),
+            ["VV", "VH", "VV_VH", "VV_1", "VH_1", "VV_VH_1"],
+        )
+
+    def test_s1_processing_windows(self):
+        s1_dataset = RemoteSensingDataset(dataset_id=self.dataset, aoi=self.aoi)
+        windows = [("2019-01-01", "2019-07-01"), ("2019-07-01", "2020-01-01")]
+        processing = RemoteSensingDatasetProcessing().s1_processing(
+            dataset=s1_dataset, windows=windows
+        )
+        self.assertEqual(processing.bandNames().size().getInfo(), 6)